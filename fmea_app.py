@@ -1,20 +1,18 @@
+from collections import Counter
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
 
 st.set_page_config(page_title="FMEA Risk Assessment & DoE Factor Selection", layout="wide")
 
-st.title("FMEA Risk Assessment & DoE Factor Selection with Validation")
-st.markdown("""
+INTRO_MD = """
 Enter your formulation/process variables with Severity, Occurrence, and Detectability scores (1-10).  
 The app calculates the Risk Priority Number (RPN), classifies risk levels per ICH guidelines,  
-visualizes risks in a heatmap, and highlights variables suggested for your Design of Experiment (DoE).  
-""")
+visualizes risks in a heatmap, and highlights variables suggested for your Design of Experiment (DoE).
+"""
 
-with st.expander("📘 ICH Q9-Based Scoring Guidelines"):
-    st.markdown("""
+GUIDE_MD = """
     #### 🔹 Severity (Impact on Product Quality or Patient Safety)
     | Score | Description | Impact |
     |-------|-------------|--------|
@@ -38,34 +36,137 @@ with st.expander("📘 ICH Q9-Based Scoring Guidelines"):
     | 7-9   | Very Low      | Detected only after release (e.g., complaints) |
     | 4-6   | Low–Medium    | Detected in QC or delayed IPC |
     | 1-3   | High          | Detected in real-time (PAT, inline controls) |
-    """)
+    """
 
-num_vars = st.number_input("Number of variables to assess", min_value=1, max_value=30, value=5, step=1)
 
-variables = []
-severity = []
-occurrence = []
-detectability = []
+@st.cache_data
+def static_content():
+    """Return the static intro and scoring-guideline markdown blocks."""
+    return INTRO_MD, GUIDE_MD
 
-st.subheader("📝 Input Variables and Risk Scores")
 
-validation_errors = []
+@st.cache_data
+def build_fmea(variables, severity, occurrence, detectability):
+    """Build the FMEA table from the collected inputs.
+
+    Cached on the input contents so unrelated reruns (e.g. checkbox toggles)
+    skip the DataFrame construction and RPN/risk-level computation.
+    """
+    sev_arr = np.asarray(severity, dtype=np.int16)
+    occ_arr = np.asarray(occurrence, dtype=np.int16)
+    det_arr = np.asarray(detectability, dtype=np.int16)
+
+    # Calculate RPN in one vectorized multiply (max 1000, so int16 is safe)
+    rpn = sev_arr * occ_arr * det_arr
+
+    df = pd.DataFrame({
+        "Variable": list(variables),
+        "Severity": sev_arr,
+        "Occurrence": occ_arr,
+        "Detectability": det_arr,
+        "RPN": rpn
+    })
+
+    # Assign Risk Levels: RPN <= 100 -> Low, 101-200 -> Medium, >200 -> High
+    # Branchless binning: two vectorized compares instead of a binary search
+    risk_code = (rpn > 100).astype(np.int8) + (rpn > 200).astype(np.int8)
+    df["Risk Level"] = pd.Categorical.from_codes(
+        risk_code, categories=["Low", "Medium", "High"], ordered=True)
+    # Kept as an int8 column so downstream filters are integer compares
+    df["_risk_code"] = risk_code
+    return df
+
+
+@st.cache_data
+def build_heatmap_data(df):
+    """Pivot mean RPN into a Severity x Occurrence grid for the heatmap.
+
+    Split out of build_fmea so the reshape only runs when the heatmap is
+    actually displayed.
+    """
+    return df.groupby(["Severity", "Occurrence"], observed=True)["RPN"].mean().unstack("Occurrence")
+
+
+def build_heatmap(heatmap_data):
+    """Build the RPN heatmap as an Altair chart.
+
+    The chart is a compact JSON spec rendered in the browser, so there is
+    no server-side figure construction or PNG encoding per rerun.
 
-for i in range(num_vars):
-    var_name = st.text_input(f"Variable {i+1} name", key=f"var_{i}")
-    sev = st.slider(f"Severity (1-10) for {var_name or 'Variable ' + str(i+1)}", 1, 10, 5, key=f"sev_{i}")
-    occ = st.slider(f"Occurrence (1-10) for {var_name or 'Variable ' + str(i+1)}", 1, 10, 5, key=f"occ_{i}")
-    det = st.slider(f"Detectability (1-10) for {var_name or 'Variable ' + str(i+1)}", 1, 10, 5, key=f"det_{i}")
+    Altair is imported here rather than at module top so its import cost
+    is only paid once a heatmap is actually rendered.
+    """
+    import altair as alt
 
-    if not var_name.strip():
-        validation_errors.append(f"Variable {i+1} name cannot be empty or whitespace.")
-    variables.append(var_name.strip() if var_name.strip() else f"Variable {i+1}")
-    severity.append(sev)
-    occurrence.append(occ)
-    detectability.append(det)
+    long = (heatmap_data.reset_index()
+            .melt("Severity", var_name="Occurrence", value_name="RPN")
+            .dropna())
+    base = alt.Chart(long).encode(
+        x=alt.X("Occurrence:O"),
+        y=alt.Y("Severity:O", sort="descending"),
+    )
+    rect = base.mark_rect().encode(
+        color=alt.Color("RPN:Q", scale=alt.Scale(scheme="yelloworangered"), title="RPN"))
+    text = base.mark_text().encode(text=alt.Text("RPN:Q", format=".0f"))
+    return (rect + text).properties(title="Heatmap of RPN by Severity and Occurrence")
+
+
+intro_md, guide_md = static_content()
+
+st.title("FMEA Risk Assessment & DoE Factor Selection with Validation")
+st.markdown(intro_md)
+
+with st.expander("📘 ICH Q9-Based Scoring Guidelines"):
+    st.markdown(guide_md)
+
+num_vars = st.number_input("Number of variables to assess", min_value=1, max_value=30, value=5, step=1)
+
+st.subheader("📝 Input Variables and Risk Scores")
+
+# One editable grid instead of 4 widgets per variable: a single widget
+# state and one payload per rerun, batched by the surrounding form.
+with st.form("fmea_inputs"):
+    seed = pd.DataFrame({
+        "Variable": [f"Variable {i+1}" for i in range(num_vars)],
+        "Severity": np.full(num_vars, 5, dtype=np.int16),
+        "Occurrence": np.full(num_vars, 5, dtype=np.int16),
+        "Detectability": np.full(num_vars, 5, dtype=np.int16),
+    })
+    score_col = st.column_config.NumberColumn(min_value=1, max_value=10, step=1, required=True)
+    edited = st.data_editor(
+        seed,
+        column_config={
+            "Variable": st.column_config.TextColumn(required=True),
+            "Severity": score_col,
+            "Occurrence": score_col,
+            "Detectability": score_col,
+        },
+        num_rows="fixed",
+        hide_index=True,
+        key="fmea_grid",
+    )
+    submitted = st.form_submit_button("Compute RPN")
+
+names = edited["Variable"].fillna("").str.strip()
+variables = [name or f"Variable {i+1}" for i, name in enumerate(names)]
+severity = edited["Severity"].to_numpy(np.int16)
+occurrence = edited["Occurrence"].to_numpy(np.int16)
+detectability = edited["Detectability"].to_numpy(np.int16)
+
+validation_errors = [f"Variable {i+1} name cannot be empty or whitespace."
+                     for i, name in enumerate(names) if not name]
+
+# Remember the submit per variable count: interactions outside the form
+# (e.g. the heatmap toggle) keep the results visible, but changing
+# num_vars re-seeds the grid and requires a fresh submit.
+if submitted:
+    st.session_state["fmea_submitted"] = num_vars
+if st.session_state.get("fmea_submitted") != num_vars:
+    st.info("Fill in the variables and scores above, then press **Compute RPN**.")
+    st.stop()
 
 # Check for duplicate variable names
-duplicates = [var for var in set(variables) if variables.count(var) > 1]
+duplicates = [var for var, count in Counter(variables).items() if count > 1]
 if duplicates:
     validation_errors.append(f"Duplicate variable names found: {', '.join(duplicates)}")
 
@@ -75,56 +176,34 @@ if validation_errors:
         st.write(f"\u2022 {err}")
     st.stop()
 
-# Create DataFrame
-df = pd.DataFrame({
-    "Variable": variables,
-    "Severity": severity,
-    "Occurrence": occurrence,
-    "Detectability": detectability
-})
-
-# Calculate RPN
-df["RPN"] = df["Severity"] * df["Occurrence"] * df["Detectability"]
-
-# Assign Risk Levels
-def risk_level(rpn):
-    if rpn <= 100:
-        return "Low"
-    elif 101 <= rpn <= 200:
-        return "Medium"
-    else:
-        return "High"
+df = build_fmea(tuple(variables), severity, occurrence, detectability)
 
-df["Risk Level"] = df["RPN"].apply(risk_level)
+# Medium and High risk rows are the DoE candidates
+doe_mask = df["_risk_code"].to_numpy() >= 1
 
 st.subheader("📊 Risk Priority Number (RPN) and Risk Levels")
-st.dataframe(df.style.format({"RPN": "{:.0f}"}))
-
-# Heatmap
-st.subheader("🔥 Heatmap Visualization: Severity vs Occurrence")
-heatmap_data = df.pivot_table(index='Severity', columns='Occurrence', values='RPN', aggfunc=np.mean)
-fig, ax = plt.subplots(figsize=(8,6))
-sns.heatmap(heatmap_data, annot=True, fmt=".0f", cmap="YlOrRd", cbar_kws={'label': 'RPN'}, ax=ax)
-ax.set_title("Heatmap of RPN by Severity and Occurrence")
-st.pyplot(fig)
-
-# DoE Suggestions
-st.subheader("🧪 Suggested Variables for DoE (Medium and High Risk)")
-doe_vars = df[df["Risk Level"].isin(["Medium", "High"])]
-
-if not doe_vars.empty:
-    st.dataframe(doe_vars[["Variable", "Severity", "Occurrence", "Detectability", "RPN", "Risk Level"]])
-else:
+df["DoE Candidate"] = doe_mask
+st.dataframe(
+    df,
+    column_config={
+        "DoE Candidate": st.column_config.CheckboxColumn(
+            help="Medium or High risk — suggested for your DoE"),
+        "_risk_code": None,
+    },
+)
+if not doe_mask.any():
     st.info("No variables classified as Medium or High risk. Nothing suggested for DoE.")
 
-# Optional: Show Low Risk
-show_low = st.checkbox("Show Low Risk Variables (Usually excluded from DoE)", value=False)
-if show_low:
-    low_vars = df[df["Risk Level"] == "Low"]
-    if not low_vars.empty:
-        st.dataframe(low_vars[["Variable", "Severity", "Occurrence", "Detectability", "RPN", "Risk Level"]])
+# Heatmap — only compute the pivot when it will actually be shown
+st.subheader("🔥 Heatmap Visualization: Severity vs Occurrence")
+show_heatmap = st.checkbox("Show heatmap", value=True)
+if show_heatmap:
+    heatmap_data = build_heatmap_data(df)
+    if df["Severity"].nunique() > 1 and df["Occurrence"].nunique() > 1:
+        st.altair_chart(build_heatmap(heatmap_data), use_container_width=True)
     else:
-        st.write("No variables classified as Low risk.")
+        # A single-valued axis gives a degenerate heatmap; a table is cheaper and clearer
+        st.dataframe(heatmap_data)
 
 # Context Note
 st.markdown("""